@@ -5,12 +5,23 @@ This script generates 200+ professional commit messages following
 conventional commit standards and best practices.
 """
 
+import gc
 import subprocess
 import random
 import os
-from datetime import datetime, timedelta
+import time
+from itertools import accumulate
 from pathlib import Path
 
+try:
+    import pygit2
+except ImportError:  # Optional: fall back to git fast-import
+    pygit2 = None
+
+COMMITTER_NAME = "QR Scanner Developer"
+COMMITTER_EMAIL = "developer@qrscanner.dev"
+COMMITTER = f"{COMMITTER_NAME} <{COMMITTER_EMAIL}>"
+
 # Professional commit message templates
 COMMIT_TYPES = [
     "feat", "fix", "docs", "style", "refactor", "perf", "test", "chore",
@@ -245,133 +256,295 @@ DETAILED_MESSAGES = [
     "with validation checks"
 ]
 
+BODY_MESSAGES = [
+    "\n\nThis change improves the {scope} functionality by\nimplementing better error handling and validation.",
+    "\n\nBREAKING CHANGE: {scope} API has been updated.",
+    "\n\nThis update enhances {scope} performance and reliability.",
+]
 
-def generate_commit_message():
-    """Generate a professional commit message."""
-    commit_type = random.choice(COMMIT_TYPES)
-    scope = random.choice(SCOPES)
-    
-    # Get template for this commit type
-    templates = MESSAGE_TEMPLATES.get(commit_type, FEAT_MESSAGES)
-    template = random.choice(templates)
-    
-    # Format the message
-    message = template.format(scope=scope)
+
+# Every (type, prefix, suffix) template, pre-split around "{scope}" so
+# rendering is a plain f-string instead of a str.format() parse
+FLAT_TEMPLATES = tuple(
+    (t, *template.split("{scope}"))
+    for t in COMMIT_TYPES for template in MESSAGE_TEMPLATES[t]
+)
+FLAT_DETAILS = tuple(DETAILED_MESSAGES)
+# None stands for the "Closes #N" body, whose issue number is drawn on use
+FLAT_BODIES = (*(tuple(body.split("{scope}")) for body in BODY_MESSAGES), None)
+
+# Every rendered (header, scope) pair with cumulative weights, built on first use
+_MESSAGE_POOL = None
+_POOL_WEIGHTS = None
+
+
+def _build_pool():
+    """Render every commit header once and return the cached pool and weights."""
+    global _MESSAGE_POOL, _POOL_WEIGHTS
     
-    # Sometimes add detailed suffix
-    if random.random() < 0.3:
-        detail = random.choice(DETAILED_MESSAGES)
-        message += f" {detail}"
+    if _MESSAGE_POOL is None:
+        pool = []
+        for t, prefix, suffix in FLAT_TEMPLATES:
+            for scope in SCOPES:
+                message = f"{prefix}{scope}{suffix}"
+                # Upper-case only the first letter; capitalize() would also
+                # lowercase the rest and turn "PEP8" into "pep8"
+                pool.append((f"{t}({scope}): {message[:1].upper()}{message[1:]}", scope))
+        _MESSAGE_POOL = tuple(pool)
+        # Keep each commit type equally likely regardless of its template count
+        _POOL_WEIGHTS = tuple(accumulate(
+            1 / len(MESSAGE_TEMPLATES[t])
+            for t, _, _ in FLAT_TEMPLATES for _ in SCOPES
+        ))
     
-    # Capitalize first letter
-    message = message.capitalize()
+    return _MESSAGE_POOL, _POOL_WEIGHTS
+
+
+def generate_commit_messages(n):
+    """Generate n professional commit messages, drawing random values in bulk."""
+    pool, weights = _build_pool()
+    choice = random.choice
     
-    # Create full commit message
-    full_message = f"{commit_type}({scope}): {message}"
+    headers = random.choices(pool, cum_weights=weights, k=n)
+    details = random.choices(FLAT_DETAILS, k=n)
     
-    # Sometimes add body
-    if random.random() < 0.2:
-        body_options = [
-            f"\n\nThis change improves the {scope} functionality by\nimplementing better error handling and validation.",
-            f"\n\nCloses #{random.randint(1, 100)}",
-            f"\n\nBREAKING CHANGE: {scope} API has been updated.",
-            f"\n\nThis update enhances {scope} performance and reliability.",
-        ]
-        full_message += random.choice(body_options)
+    # One random byte per gate: < 77 is ~30% and < 51 is ~20% of 256
+    gates = os.urandom(2 * n)
+    add_detail = [gate < 77 for gate in gates[:n]]
+    add_body = [gate < 51 for gate in gates[n:]]
     
-    return full_message
+    for (header, scope), detail, with_detail, with_body in zip(
+            headers, details, add_detail, add_body):
+        # Sometimes add detailed suffix
+        if with_detail:
+            header = f"{header} {detail}"
+        
+        # Sometimes add body
+        if not with_body:
+            yield header
+            continue
+        
+        body = choice(FLAT_BODIES)
+        if body is None:
+            yield f"{header}\n\nCloses #{random.randint(1, 100)}"
+        else:
+            prefix, suffix = body
+            yield f"{header}{prefix}{scope}{suffix}"
 
 
-def make_dummy_change():
-    """Make a small dummy change to create a commit."""
-    # Create or update a dummy file
-    dummy_file = Path("commit_history.txt")
-    
-    if dummy_file.exists():
-        with open(dummy_file, "a", encoding="utf-8") as f:
-            f.write(f"{datetime.now().isoformat()}\n")
-    else:
+def generate_commit_message():
+    """Generate a professional commit message."""
+    return next(generate_commit_messages(1))
+
+
+def make_dummy_change(history, i, tokens):
+    """Append a unique line to the in-memory commit history."""
+    token = int.from_bytes(tokens[4 * i:4 * i + 4], "little")
+    history.extend(b"%d\t%d\t%08x\n" % (i, time.time_ns(), token))
+
+
+def load_history(dummy_file):
+    """Return the contents of the history file, creating it if needed."""
+    if not dummy_file.exists():
         with open(dummy_file, "w", encoding="utf-8") as f:
             f.write("Commit History\n")
             f.write("=" * 50 + "\n")
-            f.write(f"{datetime.now().isoformat()}\n")
     
-    return dummy_file
+    return bytearray(dummy_file.read_bytes())
 
 
 def run_git_command(command, check=True):
-    """Run a git command and return the result."""
+    """Run a git command given as an argv list and return the result."""
     try:
         result = subprocess.run(
             command,
-            shell=True,
             capture_output=True,
-            text=True,
             check=check
         )
         return result.stdout.strip(), result.stderr.strip()
     except subprocess.CalledProcessError as e:
-        print(f"Error running command: {command}")
-        print(f"Error: {e.stderr}")
+        print(f"Error running command: {' '.join(command)}")
+        print(f"Error: {e.stderr.decode('utf-8', 'replace')}")
         return None, e.stderr
 
 
+def run_git_silent(command):
+    """Run a git command whose output is not needed and return its exit code."""
+    result = subprocess.run(
+        command,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=False
+    )
+    return result.returncode
+
+
 def initialize_git():
-    """Initialize git repository if not already initialized."""
+    """
+    Initialize git repository if not already initialized.
+    
+    Returns True if a new repository was created, None if git init failed.
+    """
     if not Path(".git").exists():
         print("Initializing git repository...")
-        run_git_command("git init")
-        run_git_command('git config user.name "QR Scanner Developer"')
-        run_git_command('git config user.email "developer@qrscanner.dev"')
+        # git init -b needs git 2.28+; older versions point HEAD at main by hand
+        if run_git_silent(["git", "init", "-b", "main"]) != 0:
+            output, _ = run_git_command(["git", "init"])
+            if output is None:
+                return None
+            run_git_command(["git", "symbolic-ref", "HEAD", "refs/heads/main"])
+        # Append the identity directly instead of running git config twice
+        with open(Path(".git") / "config", "a", encoding="utf-8") as f:
+            f.write(f"[user]\n\tname = {COMMITTER_NAME}\n\temail = {COMMITTER_EMAIL}\n")
         print("Git repository initialized.")
-    else:
-        print("Git repository already initialized.")
+        return True
+    
+    print("Git repository already initialized.")
+    return False
 
 
-def create_commits(num_commits=200):
-    """Create multiple commits with professional messages."""
-    print(f"Creating {num_commits} professional commits...")
+def _create_commits_fast_import(num_commits, created, dummy_file, history):
+    """
+    Create commits by streaming them through a single git fast-import process.
     
-    initialize_git()
+    Returns the number of commits created, or None if fast-import failed.
+    """
+    # Commits are appended to the checked-out branch, on top of its tip
+    branch, _ = run_git_command(["git", "symbolic-ref", "-q", "HEAD"], check=False)
+    if created:
+        parent = None
+    else:
+        parent, _ = run_git_command(["git", "rev-parse", "-q", "--verify", "HEAD"], check=False)
     
-    # Set git config if not already set
-    run_git_command('git config user.name "QR Scanner Developer"', check=False)
-    run_git_command('git config user.email "developer@qrscanner.dev"', check=False)
+    committer = f"committer {COMMITTER} {int(time.time())} +0000\n".encode("utf-8")
+    tokens = os.urandom(4 * num_commits)
     
+    # Stream every blob and commit through a single fast-import process
+    # instead of spawning `git add` + `git commit` once per commit.
+    process = subprocess.Popen(
+        ["git", "fast-import", "--quiet", "--date-format=raw"],
+        stdin=subprocess.PIPE
+    )
+    stream = process.stdin
     commits_created = 0
     
-    for i in range(num_commits):
-        try:
-            # Generate commit message
-            commit_message = generate_commit_message()
-            
-            # Make a small change
-            dummy_file = make_dummy_change()
+    try:
+        for i, commit_message in enumerate(generate_commit_messages(num_commits)):
+            commit_message = commit_message.encode("utf-8")
+            make_dummy_change(history, i, tokens)
             
-            # Stage the change
-            stdout, stderr = run_git_command(f'git add {dummy_file}')
+            stream.write(b"blob\nmark :%d\ndata %d\n" % (i + 1, len(history)))
+            stream.write(history)
+            stream.write(b"\ncommit %s\n" % branch)
+            stream.write(committer)
+            stream.write(b"data %d\n" % len(commit_message))
+            stream.write(commit_message)
+            stream.write(b"\n")
+            if i == 0 and parent:
+                stream.write(b"from %s\n" % parent)
+            stream.write(b"M 100644 :%d %s\n\n" % (i + 1, dummy_file.name.encode("utf-8")))
             
-            # Create commit
-            stdout, stderr = run_git_command(
-                f'git commit -m "{commit_message}"',
-                check=False
-            )
+            commits_created += 1
+            if (commits_created % 10 == 0):
+                print(f"Created {commits_created} commits...")
+    except Exception as e:
+        print(f"Error creating commit {commits_created + 1}: {str(e)}")
+    finally:
+        stream.close()
+        process.wait()
+    
+    if process.returncode != 0:
+        print(f"git fast-import failed with exit code {process.returncode}")
+        return None
+    
+    return commits_created
+
+
+def _create_commits_pygit2(num_commits, dummy_file, history):
+    """
+    Create commits in-process with libgit2, without spawning git.
+    
+    Returns the number of commits created.
+    """
+    repo = pygit2.Repository(".")
+    signature = pygit2.Signature(COMMITTER_NAME, COMMITTER_EMAIL)
+    tokens = os.urandom(4 * num_commits)
+    
+    # Commits are appended to the checked-out branch, on top of its tip
+    if repo.head_is_unborn:
+        branch = repo.references["HEAD"].target
+        parents = []
+        tree_builder = repo.TreeBuilder()
+    else:
+        branch = repo.head.name
+        head = repo.head.peel(pygit2.Commit)
+        parents = [head.id]
+        tree_builder = repo.TreeBuilder(head.tree)
+    
+    commits_created = 0
+    
+    try:
+        for i, commit_message in enumerate(generate_commit_messages(num_commits)):
+            make_dummy_change(history, i, tokens)
             
-            if "nothing to commit" not in stderr.lower():
-                commits_created += 1
-                if (commits_created % 10 == 0):
-                    print(f"Created {commits_created} commits...")
-            else:
-                # Make another change to ensure we have something to commit
-                with open(dummy_file, "a", encoding="utf-8") as f:
-                    f.write(f"Update {i}\n")
-                run_git_command(f'git add {dummy_file}')
-                run_git_command(f'git commit -m "{commit_message}"', check=False)
-                commits_created += 1
+            blob = repo.create_blob(bytes(history))
+            tree_builder.insert(dummy_file.name, blob, pygit2.GIT_FILEMODE_BLOB)
+            tree = tree_builder.write()
+            parents = [repo.create_commit(None, signature, signature,
+                                          commit_message, tree, parents)]
             
-        except Exception as e:
-            print(f"Error creating commit {i+1}: {str(e)}")
-            continue
+            commits_created += 1
+            if (commits_created % 10 == 0):
+                print(f"Created {commits_created} commits...")
+    except Exception as e:
+        print(f"Error creating commit {commits_created + 1}: {str(e)}")
+    
+    # Move the branch once, to the last commit in the chain
+    if commits_created:
+        repo.references.create(branch, parents[0], force=True)
+    
+    return commits_created
+
+
+def create_commits(num_commits=200):
+    """Create multiple commits with professional messages."""
+    print(f"Creating {num_commits} professional commits...")
+    
+    created = initialize_git()
+    if created is None:
+        print("Could not initialize git repository.")
+        return 0
+    
+    # Both backends append to the checked-out branch, so they need one
+    if run_git_silent(["git", "symbolic-ref", "-q", "HEAD"]) != 0:
+        print("HEAD is detached. Check out a branch before creating commits.")
+        return 0
+    
+    dummy_file = Path("commit_history.txt")
+    history = load_history(dummy_file)
+    history_start = len(history)
+    
+    # The commit loop only creates short-lived, acyclic objects
+    gc.disable()
+    try:
+        if pygit2 is not None:
+            commits_created = _create_commits_pygit2(num_commits, dummy_file, history)
+        else:
+            commits_created = _create_commits_fast_import(num_commits, created,
+                                                          dummy_file, history)
+    finally:
+        gc.enable()
+    if commits_created is None:
+        return 0
+    
+    # Append the new history lines to the working tree copy in one write,
+    # then keep the index in sync with the new branch tip
+    fd = os.open(dummy_file, os.O_WRONLY | os.O_APPEND)
+    try:
+        os.write(fd, memoryview(history)[history_start:])
+    finally:
+        os.close(fd)
+    run_git_silent(["git", "add", str(dummy_file)])
     
     print(f"\nSuccessfully created {commits_created} commits!")
     return commits_created
@@ -385,21 +558,21 @@ def push_to_github(repo_url=None):
     print(f"\nPushing to {repo_url}...")
     
     # Check if remote exists
-    stdout, _ = run_git_command("git remote -v", check=False)
+    stdout, _ = run_git_command(["git", "remote", "-v"], check=False)
     
-    if "origin" not in stdout:
+    if b"origin" not in stdout:
         print("Adding remote origin...")
-        run_git_command(f'git remote add origin {repo_url}', check=False)
+        run_git_silent(["git", "remote", "add", "origin", repo_url])
     else:
         print("Remote origin already exists. Updating URL...")
-        run_git_command(f'git remote set-url origin {repo_url}', check=False)
+        run_git_silent(["git", "remote", "set-url", "origin", repo_url])
     
     # Push to main branch
     print("Pushing to main branch...")
-    stdout, stderr = run_git_command("git push -u origin main", check=False)
+    stdout, stderr = run_git_command(["git", "push", "-u", "origin", "main"], check=False)
     
-    if "error" in stderr.lower() or "fatal" in stderr.lower():
-        print(f"Push may require authentication. Error: {stderr}")
+    if b"error" in stderr or b"fatal" in stderr:
+        print(f"Push may require authentication. Error: {stderr.decode('utf-8', 'replace')}")
         print("\nYou may need to:")
         print("1. Set up SSH keys or personal access token")
         print("2. Run: git push -u origin main")
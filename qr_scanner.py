@@ -4,21 +4,24 @@ Professional QR Code Scanner
 A comprehensive tool for scanning QR codes from webcam, images, and files.
 """
 
-import cv2
-import numpy as np
-from pyzbar import pyzbar
+from __future__ import annotations
+
 import argparse
 import sys
 import json
 import os
+import re
+import time
 from datetime import datetime
 from pathlib import Path
 import logging
-from typing import List, Dict, Optional, Tuple
-import tkinter as tk
-from tkinter import filedialog, messagebox, scrolledtext
-from PIL import Image, ImageTk
+from typing import TYPE_CHECKING, List, Dict, Iterator, Optional, Tuple
 import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+
+if TYPE_CHECKING:
+    import numpy as np
 
 # Configure logging
 logging.basicConfig(
@@ -32,13 +35,49 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _import_tkinter():
+    """Import tkinter on first use, so CLI scans never load it."""
+    global tk, filedialog, messagebox, scrolledtext
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, scrolledtext
+
+
 class QRCodeScanner:
     """Main QR Code Scanner class with multiple scanning capabilities."""
     
+    # Matches .jpg, .jpeg, .png, .bmp, .tiff, .tif and .gif in any case
+    SUPPORTED_FORMATS_RE = re.compile(r'\.(?:jpe?g|png|bmp|tiff?|gif)$', re.IGNORECASE)
+    
     def __init__(self, output_file: Optional[str] = None):
         self.output_file = output_file
         self.results = []
         self.camera = None
+        self._seen = set()  # Webcam payloads already recorded, across sessions
+        self._frame_lock = threading.Lock()  # Guards the webcam frame handoff below
+        self._latest_frame = None  # Newest frame waiting for the decoder thread
+        self._latest_codes = []  # Codes from the last decoded frame, for the preview
+        self._detector = self._create_detector()
+        
+        # A .jsonl output file is appended to as each code is detected, so
+        # results survive an interrupted scan
+        self._jsonl = None
+        if output_file and output_file.endswith('.jsonl'):
+            self._jsonl = open(output_file, 'a', encoding='utf-8')
+    
+    @staticmethod
+    def _create_detector():
+        """Create OpenCV's native WeChat QR detector, or None to use pyzbar."""
+        import cv2
+        
+        # Only opencv-contrib builds ship the wechat_qrcode module
+        if not hasattr(cv2, 'wechat_qrcode_WeChatQRCode'):
+            return None
+        
+        try:
+            return cv2.wechat_qrcode_WeChatQRCode()
+        except cv2.error as e:
+            logger.warning(f"WeChat QR detector unavailable, using pyzbar: {str(e)}")
+            return None
         
     def scan_image(self, image_path: str) -> List[Dict]:
         """
@@ -50,69 +89,128 @@ class QRCodeScanner:
         Returns:
             List of detected QR codes with their data
         """
+        import cv2
+        import numpy as np
+        
         try:
             if not os.path.exists(image_path):
                 logger.error(f"Image file not found: {image_path}")
                 return []
             
-            image = cv2.imread(image_path)
+            # Read the bytes ourselves and decode straight to grayscale, the
+            # only form the detectors use, skipping libjpeg's BGR output
+            with open(image_path, 'rb') as f:
+                data = np.frombuffer(f.read(), dtype=np.uint8)
+            image = cv2.imdecode(data, cv2.IMREAD_GRAYSCALE)
             if image is None:
                 logger.error(f"Failed to load image: {image_path}")
                 return []
             
-            return self._decode_qr_codes(image, source=image_path)
+            codes, _ = self._decode_qr_codes(image, source=image_path)
+            return codes
         except Exception as e:
             logger.error(f"Error scanning image {image_path}: {str(e)}")
             return []
     
-    def scan_webcam(self, duration: int = 30, show_preview: bool = True) -> List[Dict]:
+    def scan_webcam(self, duration: int = 30, show_preview: bool = True,
+                    decode_fps: float = 8.0, detect_width: int = 640,
+                    capture_resolution: Optional[Tuple[int, int]] = (640, 480)) -> List[Dict]:
         """
         Scan QR codes from webcam feed.
         
         Args:
             duration: Duration in seconds to scan (0 for infinite)
             show_preview: Whether to show camera preview
+            decode_fps: Maximum decode attempts per second (0 to decode every frame)
+            detect_width: Downscale wider frames to this width before decoding (0 to disable)
+            capture_resolution: (width, height) to request from the camera (None for its default)
             
         Returns:
             List of detected QR codes with their data
         """
+        import cv2
+        
         try:
             self.camera = cv2.VideoCapture(0)
             if not self.camera.isOpened():
                 logger.error("Failed to open camera")
                 return []
             
+            # Keep only the newest frame queued so decoding never runs on stale
+            # frames, and ask for MJPEG to cut USB bandwidth and raise FPS
+            if not self.camera.set(cv2.CAP_PROP_BUFFERSIZE, 1):
+                logger.warning("Camera does not support setting the buffer size")
+            self.camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+            
+            # QR codes stay readable at 480p, and smaller frames are cheaper to
+            # transfer, convert and decode than the camera's default (often 720p+)
+            if capture_resolution:
+                width, height = capture_resolution
+                self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+                self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            
             logger.info("Starting webcam scan... Press 'q' to quit")
             start_time = datetime.now()
-            detected_codes = set()  # To avoid duplicates
             
-            while True:
-                ret, frame = self.camera.read()
-                if not ret:
-                    break
-                
-                # Check duration limit
-                if duration > 0:
-                    elapsed = (datetime.now() - start_time).total_seconds()
-                    if elapsed >= duration:
+            # Decoding runs in a worker thread so a slow decode never stalls
+            # capture or preview; frames are handed over one at a time
+            with self._frame_lock:
+                self._latest_frame = None
+                self._latest_codes = []
+            frame_wanted = threading.Event()
+            frame_ready = threading.Event()
+            stop = threading.Event()
+            frame_wanted.set()
+            decoder = threading.Thread(
+                target=self._decode_webcam_frames,
+                args=(frame_wanted, frame_ready, stop, show_preview,
+                      decode_fps, detect_width),
+                daemon=True
+            )
+            decoder.start()
+            
+            try:
+                while True:
+                    # grab() dequeues the frame without converting it to BGR;
+                    # retrieve() below only pays for that when the frame is used
+                    if not self.camera.grab():
                         break
-                
-                # Decode QR codes
-                codes = self._decode_qr_codes(frame, source="webcam")
-                for code in codes:
-                    code_str = code.get('data', '')
-                    if code_str and code_str not in detected_codes:
-                        detected_codes.add(code_str)
-                        self.results.append(code)
-                        logger.info(f"QR Code detected: {code_str[:50]}...")
-                
-                if show_preview:
-                    # Draw bounding boxes
-                    frame = self._draw_bounding_boxes(frame, codes)
-                    cv2.imshow('QR Code Scanner - Press Q to quit', frame)
                     
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                    # Check duration limit
+                    if duration > 0:
+                        elapsed = (datetime.now() - start_time).total_seconds()
+                        if elapsed >= duration:
+                            break
+                    
+                    wanted = frame_wanted.is_set()
+                    if not wanted and not show_preview:
+                        continue
+                    
+                    ret, frame = self.camera.retrieve()
+                    if not ret:
                         break
+                    
+                    # Hand the frame to the decoder, which now owns it
+                    if wanted:
+                        frame_wanted.clear()
+                        with self._frame_lock:
+                            self._latest_frame = frame
+                        frame_ready.set()
+                    
+                    if show_preview:
+                        with self._frame_lock:
+                            codes = self._latest_codes
+                        
+                        # Draw bounding boxes
+                        frame = self._draw_bounding_boxes(
+                            frame.copy() if wanted else frame, codes)
+                        cv2.imshow('QR Code Scanner - Press Q to quit', frame)
+                        
+                        if cv2.waitKey(1) & 0xFF == ord('q'):
+                            break
+            finally:
+                stop.set()
+                decoder.join()
             
             if show_preview:
                 cv2.destroyAllWindows()
@@ -125,6 +223,52 @@ class QRCodeScanner:
             self._release_camera()
             return []
     
+    def _decode_webcam_frames(self, frame_wanted: threading.Event,
+                              frame_ready: threading.Event, stop: threading.Event,
+                              show_preview: bool, decode_fps: float, detect_width: int):
+        """Decode frames handed over by scan_webcam until stop is set."""
+        import cv2
+        
+        decode_interval = 1.0 / decode_fps if decode_fps > 0 else 0.0
+        last_success = float('-inf')
+        last_hash = None
+        
+        while not stop.is_set():
+            if not frame_ready.wait(timeout=0.1):
+                continue
+            frame_ready.clear()
+            with self._frame_lock:
+                frame, self._latest_frame = self._latest_frame, None
+            
+            started = time.monotonic()
+            try:
+                # One grayscale copy serves both the hash and the decoder
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                frame_hash = self._frame_hash(gray)
+                
+                # Skip scenes unchanged since a successful decode in the last second
+                unchanged = frame_hash == last_hash and started - last_success < 1.0
+                last_hash = frame_hash
+                if not unchanged:
+                    # The preview still needs boxes for already-seen codes
+                    codes, found = self._decode_qr_codes(gray, source="webcam",
+                                                         detect_width=detect_width,
+                                                         skip_seen=not show_preview,
+                                                         record_new=True)
+                    # Seen codes left out by skip_seen still count as a success
+                    if found:
+                        last_success = started
+                    with self._frame_lock:
+                        self._latest_codes = codes
+            except Exception as e:
+                logger.error(f"Error decoding webcam frame: {str(e)}")
+            
+            # Decode at most decode_fps times per second
+            remaining = decode_interval - (time.monotonic() - started)
+            if remaining > 0:
+                stop.wait(remaining)
+            frame_wanted.set()
+    
     def scan_directory(self, directory: str, recursive: bool = True) -> List[Dict]:
         """
         Scan QR codes from all images in a directory.
@@ -136,7 +280,6 @@ class QRCodeScanner:
         Returns:
             List of detected QR codes with their data
         """
-        supported_formats = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', '.gif'}
         results = []
         
         try:
@@ -145,47 +288,192 @@ class QRCodeScanner:
                 logger.error(f"Directory not found: {directory}")
                 return []
             
-            pattern = '**/*' if recursive else '*'
-            image_files = [f for f in path.glob(pattern) 
-                          if f.suffix.lower() in supported_formats]
+            # Files are enumerated lazily instead of listing the whole tree up front
+            image_files = self._iter_image_files(directory, recursive)
+            first_files = list(islice(image_files, 2))
+            scanned = 0
             
-            logger.info(f"Found {len(image_files)} image files to scan")
+            # Images share no state, so decode them in parallel processes
+            if len(first_files) < 2 or (os.cpu_count() or 1) <= 1:
+                for image_file in chain(first_files, image_files):
+                    logger.info(f"Scanning: {image_file}")
+                    results.extend(self.scan_image(image_file))
+                    scanned += 1
+            else:
+                with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                    for codes in executor.map(_scan_image_worker,
+                                              chain(first_files, image_files),
+                                              chunksize=4):
+                        results.extend(codes)
+                        scanned += 1
             
-            for image_file in image_files:
-                logger.info(f"Scanning: {image_file}")
-                codes = self.scan_image(str(image_file))
-                results.extend(codes)
+            logger.info(f"Scanned {scanned} image files")
                 
         except Exception as e:
             logger.error(f"Error scanning directory: {str(e)}")
         
         return results
     
-    def _decode_qr_codes(self, image: np.ndarray, source: str = "unknown") -> List[Dict]:
-        """Internal method to decode QR codes from image array."""
-        codes = pyzbar.decode(image)
+    @classmethod
+    def _iter_image_files(cls, directory: str, recursive: bool) -> Iterator[str]:
+        """Yield paths of supported image files in a directory as they are found."""
+        # Like Path.glob, skip directories that cannot be read
+        try:
+            entries = os.scandir(directory)
+        except OSError as e:
+            logger.warning(f"Skipping unreadable directory {directory}: {str(e)}")
+            return
+        
+        with entries:
+            subdirectories = []
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+                elif cls.SUPPORTED_FORMATS_RE.search(entry.name):
+                    yield entry.path
+        
+        if recursive:
+            for subdirectory in subdirectories:
+                yield from cls._iter_image_files(subdirectory, recursive)
+    
+    def _decode_qr_codes(self, image: np.ndarray, source: str = "unknown",
+                         detect_width: int = 0, skip_seen: bool = False,
+                         record_new: bool = False) -> Tuple[List[Dict], int]:
+        """
+        Internal method to decode QR codes from image array.
+        
+        Images are decoded in grayscale, and images wider than detect_width
+        from a downscaled copy; coordinates are mapped back to the original
+        image.
+        
+        Seen codes are keyed on their raw payload. With skip_seen, codes
+        already recorded by a webcam scan are left out before their payload
+        is decoded to text; otherwise every code is decoded. With record_new,
+        codes not seen before are recorded and marked as seen.
+        
+        Returns the results and the number of codes the detector found,
+        including any left out by skip_seen.
+        """
+        import cv2
+        
+        scale = 1.0
+        if detect_width and image.shape[1] > detect_width:
+            scale = detect_width / image.shape[1]
+            image = cv2.resize(image, None, fx=scale, fy=scale,
+                               interpolation=cv2.INTER_AREA)
+        
+        # The detectors binarize luminance anyway; a single-channel image
+        # saves them the conversion and two thirds of the memory traffic
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        
         results = []
+        timestamp = datetime.now().isoformat()
         
-        for code in codes:
+        detected = self._detect_codes(image)
+        for payload, code_type, rect, polygon in detected:
+            is_new = bool(payload) and payload not in self._seen
+            if skip_seen and not is_new:
+                continue
+            
+            data = payload
+            if isinstance(data, bytes):
+                data = data.decode('utf-8', errors='replace')
+            
+            left, top, width, height = rect
+            if scale != 1.0:
+                left, top, width, height = (round(v / scale) for v in rect)
+                polygon = [(round(x / scale), round(y / scale)) for x, y in polygon]
+            
             result = {
-                'data': code.data.decode('utf-8'),
-                'type': code.type,
+                'data': data,
+                'type': code_type,
                 'rect': {
-                    'left': code.rect.left,
-                    'top': code.rect.top,
-                    'width': code.rect.width,
-                    'height': code.rect.height
+                    'left': left,
+                    'top': top,
+                    'width': width,
+                    'height': height
                 },
-                'polygon': [(p.x, p.y) for p in code.polygon],
+                'polygon': polygon,
                 'source': source,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': timestamp
             }
             results.append(result)
+            
+            if record_new and is_new:
+                self._seen.add(payload)
+                self.record_results([result])
+                logger.info(f"QR Code detected: {data[:50]}...")
         
-        return results
+        return results, len(detected)
+    
+    def clear_results(self):
+        """Forget all recorded results and previously seen codes."""
+        self.results = []
+        self._seen.clear()
+    
+    def record_results(self, codes: List[Dict]):
+        """
+        Keep detected codes and append them to the JSON Lines output, if any.
+        
+        Args:
+            codes: QR codes returned by scan_image or scan_directory
+        """
+        self.results.extend(codes)
+        if self._jsonl is not None and codes:
+            self._jsonl.writelines(json.dumps(code, ensure_ascii=False) + '\n'
+                                   for code in codes)
+            self._jsonl.flush()
+    
+    def close(self):
+        """Release the camera and close the JSON Lines output, if open."""
+        self._release_camera()
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    @staticmethod
+    def _frame_hash(frame: np.ndarray) -> bytes:
+        """Return an 8x8 average hash of a grayscale frame for cheap change detection."""
+        import cv2
+        
+        small = cv2.resize(frame, (8, 8), interpolation=cv2.INTER_AREA)
+        return (small > small.mean()).tobytes()
+    
+    def _detect_codes(self, image: np.ndarray) -> List[Tuple]:
+        """
+        Run the QR detector and return (payload, type, rect, polygon) tuples.
+        
+        The payload is the raw bytes from pyzbar, or the text from WeChat.
+        """
+        import cv2
+        import numpy as np
+        
+        if self._detector is not None:
+            texts, points_list = self._detector.detectAndDecode(image)
+            return [(text, 'QRCODE', cv2.boundingRect(points),
+                     points.astype(np.int32).tolist())
+                    for text, points in zip(texts, points_list) if text]
+        
+        from pyzbar import pyzbar
+        
+        # Only look for QR codes, so ZBar skips its 1D barcode decoders;
+        # pyzbar's Point is already an (x, y) tuple, so no per-vertex repacking
+        return [(code.data, code.type, tuple(code.rect),
+                 list(code.polygon))
+                for code in pyzbar.decode(image, symbols=[pyzbar.ZBarSymbol.QRCODE])]
     
     def _draw_bounding_boxes(self, image: np.ndarray, codes: List[Dict]) -> np.ndarray:
         """Draw bounding boxes around detected QR codes."""
+        import cv2
+        import numpy as np
+        
         for code in codes:
             polygon = code.get('polygon', [])
             if polygon:
@@ -208,7 +496,7 @@ class QRCodeScanner:
     
     def save_results(self, filename: Optional[str] = None) -> str:
         """
-        Save scan results to JSON file.
+        Save scan results to JSON file, or to JSON Lines for a .jsonl filename.
         
         Args:
             filename: Output filename (optional)
@@ -216,11 +504,26 @@ class QRCodeScanner:
         Returns:
             Path to saved file
         """
+        now = datetime.now()
         if filename is None:
-            filename = self.output_file or f"qr_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            filename = self.output_file or f"qr_results_{now.strftime('%Y%m%d_%H%M%S')}.json"
+        
+        if self._jsonl is not None and filename == self.output_file:
+            # Every result was already streamed when it was detected
+            self._jsonl.flush()
+            logger.info(f"Results saved to {filename}")
+            return filename
+        
+        if filename.endswith('.jsonl'):
+            with open(filename, 'w', encoding='utf-8') as f:
+                for result in self.results:
+                    f.write(json.dumps(result, ensure_ascii=False) + '\n')
+            
+            logger.info(f"Results saved to {filename}")
+            return filename
         
         output = {
-            'scan_date': datetime.now().isoformat(),
+            'scan_date': now.isoformat(),
             'total_codes': len(self.results),
             'results': self.results
         }
@@ -241,12 +544,13 @@ class QRCodeScanner:
         Returns:
             Path to saved file
         """
+        now = datetime.now()
         if filename is None:
-            filename = f"qr_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+            filename = f"qr_results_{now.strftime('%Y%m%d_%H%M%S')}.txt"
         
         with open(filename, 'w', encoding='utf-8') as f:
             f.write(f"QR Code Scan Results\n")
-            f.write(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"Date: {now.strftime('%Y-%m-%d %H:%M:%S')}\n")
             f.write(f"Total Codes Found: {len(self.results)}\n")
             f.write("=" * 50 + "\n\n")
             
@@ -262,10 +566,24 @@ class QRCodeScanner:
         return filename
 
 
+_worker_scanner = None
+
+
+def _scan_image_worker(image_path: str) -> List[Dict]:
+    """Scan a single image, reusing one scanner per worker process."""
+    global _worker_scanner
+    if _worker_scanner is None:
+        _worker_scanner = QRCodeScanner()
+    
+    logger.info(f"Scanning: {image_path}")
+    return _worker_scanner.scan_image(image_path)
+
+
 class QRScannerGUI:
     """GUI application for QR Code Scanner."""
     
     def __init__(self, root):
+        _import_tkinter()
         self.root = root
         self.root.title("Professional QR Code Scanner")
         self.root.geometry("800x600")
@@ -346,7 +664,7 @@ class QRScannerGUI:
         if filename:
             self.update_status(f"Scanning {os.path.basename(filename)}...")
             codes = self.scanner.scan_image(filename)
-            self.scanner.results.extend(codes)
+            self.scanner.record_results(codes)
             self.update_results()
             self.update_status(f"Found {len(codes)} QR code(s) in image")
     
@@ -357,13 +675,13 @@ class QRScannerGUI:
         if directory:
             self.update_status(f"Scanning directory: {directory}...")
             codes = self.scanner.scan_directory(directory, recursive=True)
-            self.scanner.results.extend(codes)
+            self.scanner.record_results(codes)
             self.update_results()
             self.update_status(f"Found {len(codes)} QR code(s) in directory")
     
     def clear_results(self):
         """Clear all scan results."""
-        self.scanner.results = []
+        self.scanner.clear_results()
         self.update_results()
         self.update_status("Results cleared")
     
@@ -433,7 +751,7 @@ Examples:
     parser.add_argument('--recursive', action='store_true', default=True,
                        help='Recursively scan subdirectories (default: True)')
     parser.add_argument('--output', type=str,
-                       help='Output file for results (JSON or TXT)')
+                       help='Output file for results (JSON, JSONL or TXT)')
     parser.add_argument('--duration', type=int, default=30,
                        help='Webcam scan duration in seconds (0 for infinite)')
     parser.add_argument('--no-preview', action='store_true',
@@ -445,6 +763,7 @@ Examples:
     
     # Launch GUI if requested
     if args.gui or (not args.webcam and not args.image and not args.directory):
+        _import_tkinter()
         root = tk.Tk()
         app = QRScannerGUI(root)
         root.mainloop()
@@ -461,10 +780,12 @@ Examples:
             
         elif args.image:
             codes = scanner.scan_image(args.image)
+            scanner.record_results(codes)
             print(f"\nDetected {len(codes)} QR code(s) in {args.image}")
             
         elif args.directory:
             codes = scanner.scan_directory(args.directory, recursive=args.recursive)
+            scanner.record_results(codes)
             print(f"\nDetected {len(codes)} QR code(s) in directory")
         
         # Display results
@@ -485,11 +806,12 @@ Examples:
             
     except KeyboardInterrupt:
         print("\nScan interrupted by user")
-        scanner._release_camera()
         sys.exit(0)
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         sys.exit(1)
+    finally:
+        scanner.close()
 
 
 if __name__ == "__main__":